@@ -1,217 +1,404 @@
 import os
+import sys
 import time
 import random
-from typing import Dict, List, Type, Any
-from dataclasses import dataclass
-from enum import Enum, auto
-from rx.subject import Subject
+from typing import Callable, Dict, FrozenSet, List, Tuple, Type, Any
+from dataclasses import dataclass, field
+from enum import IntEnum
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional; the kernel runs as plain Python without it
+    def njit(*args, **kwargs):
+        return lambda fn: fn
 
 # ECS Core
-@dataclass
-class Entity:
-    id: int
-    components: Dict[Type, Any]
+# Entities sharing one component signature, stored as parallel columns.
+# Rows are tracked with a sparse set: dense lists the entity in each row,
+# sparse maps an entity id straight to its row by list index.
+class Archetype:
+    def __init__(self, types: FrozenSet[Type]):
+        self.types = types
+        self.columns: Dict[Type, List[Any]] = {t: [] for t in types}
+        self.dense: List[int] = []
+        self.sparse: List[int] = []
+
+    def __contains__(self, entity_id: int) -> bool:
+        if entity_id >= len(self.sparse):
+            return False
+        row = self.sparse[entity_id]
+        return row < len(self.dense) and self.dense[row] == entity_id
+
+    def append(self, entity_id: int, components: Dict[Type, Any]) -> int:
+        row = len(self.dense)
+        for component_type, column in self.columns.items():
+            column.append(components[component_type])
+        if entity_id >= len(self.sparse):
+            self.sparse.extend([0] * (entity_id + 1 - len(self.sparse)))
+        self.sparse[entity_id] = row
+        self.dense.append(entity_id)
+        return row
+
+    def remove(self, entity_id: int) -> Dict[Type, Any]:
+        # Swap the last row into the hole so the columns stay dense
+        row = self.sparse[entity_id]
+        last = len(self.dense) - 1
+        components = {}
+        for component_type, column in self.columns.items():
+            components[component_type] = column[row]
+            column[row] = column[last]
+            column.pop()
+        moved = self.dense.pop()
+        if row != last:
+            self.dense[row] = moved
+            self.sparse[moved] = row
+        return components
 
 class World:
     def __init__(self):
-        self.entities: Dict[int, Entity] = {}
         self.next_entity_id: int = 0
-        self.components: Dict[Type, Dict[int, Any]] = {}
+        self.archetypes: Dict[FrozenSet[Type], Archetype] = {}
+        self.entity_archetype: List[Archetype] = []
+        # Matching archetypes per queried signature, kept current as archetypes appear
+        self._queries: Dict[FrozenSet[Type], List[Archetype]] = {}
         self.systems: List['System'] = []
+        # Bound update methods, captured once so a tick skips the attribute lookups
+        self._system_fns: tuple = ()
+
+    def _get_archetype(self, types: FrozenSet[Type]) -> Archetype:
+        archetype = self.archetypes.get(types)
+        if archetype is None:
+            archetype = self.archetypes[types] = Archetype(types)
+            for required, matches in self._queries.items():
+                if types.issuperset(required):
+                    matches.append(archetype)
+        return archetype
 
     def create_entity(self) -> int:
         entity_id = self.next_entity_id
         self.next_entity_id += 1
-        self.entities[entity_id] = Entity(entity_id, {})
+        archetype = self._get_archetype(frozenset())
+        archetype.append(entity_id, {})
+        self.entity_archetype.append(archetype)
         return entity_id
 
     def add_component(self, entity_id: int, component: Any):
         component_type = type(component)
-        self.entities[entity_id].components[component_type] = component
-        if component_type not in self.components:
-            self.components[component_type] = {}
-        self.components[component_type][entity_id] = component
+        archetype = self.entity_archetype[entity_id]
+        if component_type in archetype.types:
+            archetype.columns[component_type][archetype.sparse[entity_id]] = component
+            return
+        # Adding a component changes the signature, so the entity moves archetype
+        components = archetype.remove(entity_id)
+        components[component_type] = component
+        archetype = self._get_archetype(archetype.types | {component_type})
+        archetype.append(entity_id, components)
+        self.entity_archetype[entity_id] = archetype
 
     def get_component(self, entity_id: int, component_type: Type) -> Any:
-        return self.entities[entity_id].components.get(component_type)
-
-    def get_entities_with_component(self, component_type: Type) -> List[int]:
-        return list(self.components.get(component_type, {}).keys())
+        archetype = self.entity_archetype[entity_id]
+        column = archetype.columns.get(component_type)
+        if column is None:
+            return None
+        return column[archetype.sparse[entity_id]]
+
+    def query(self, *component_types: Type) -> List[Archetype]:
+        required = frozenset(component_types)
+        matches = self._queries.get(required)
+        if matches is None:
+            matches = self._queries[required] = [
+                a for a in self.archetypes.values() if a.types.issuperset(required)
+            ]
+        return matches
 
     def add_system(self, system: 'System'):
+        # Bind the system to the live list of archetypes it iterates
+        system.archetypes = self.query(*system.required)
         self.systems.append(system)
+        self._system_fns = self._system_fns + (system.update,)
 
     def update(self, dt: float):
-        for system in self.systems:
-            system.update(self, dt)
+        for fn in self._system_fns:
+            fn(self, dt)
 
 class System:
+    required: Tuple[Type, ...] = ()
+    # Set by World.add_system
+    archetypes: List[Archetype]
+
     def update(self, world: World, dt: float):
         pass
 
 # Game Components
-class Direction(Enum):
-    UP = auto()
-    DOWN = auto()
-    LEFT = auto()
-    RIGHT = auto()
-
-@dataclass
-class Position:
-    x: int
-    y: int
+class Direction(IntEnum):
+    UP = 0
+    DOWN = 1
+    LEFT = 2
+    RIGHT = 3
+
+# Per-direction (dx, dy) step on the grid and reverse direction, indexed by Direction
+_DELTA = ((0, -1), (0, 1), (-1, 0), (1, 0))
+_OPPOSITE = (Direction.DOWN, Direction.UP, Direction.RIGHT, Direction.LEFT)
 
-@dataclass
+@dataclass(slots=True)
 class Velocity:
-    direction: Direction
+    direction: int
+    dx: int
+    dy: int
 
-@dataclass
+@dataclass(slots=True)
 class Snake:
-    body: List[tuple[int, int]]
+    # Ring buffer of body cells as parallel x/y columns; row head is the
+    # head, followed by length - 1 segments towards the tail
+    body_x: np.ndarray
+    body_y: np.ndarray
+    # Flat width * height grid indexed by y * width + x, non-zero on every
+    # cell covered by the body
+    occupied: np.ndarray
+    # Flat indices of the cells not covered by the body: the first free_count
+    # entries of free_cells, with free_index mapping each cell to its slot
+    free_cells: np.ndarray
+    free_index: np.ndarray
+    free_count: int
+    head: int = 0
+    length: int = 1
     growth_pending: int = 0
+    # Outcome of the last move, consumed by CollisionSystem
+    ate: bool = False
+    collided: bool = False
 
-@dataclass
+@dataclass(slots=True)
 class Food:
-    position: Position
+    x: int
+    y: int
 
-@dataclass
+@dataclass(slots=True)
 class Score:
     value: int = 0
-    score_changed: Subject = Subject()
+    # Callbacks invoked with the new score
+    score_changed: List[Callable[[int], None]] = field(default_factory=list)
 
-@dataclass
+@dataclass(slots=True)
 class Grid:
     width: int
     height: int
 
-@dataclass
+@dataclass(slots=True)
 class GameState:
     is_game_over: bool = False
-    game_over_subject: Subject = Subject()
+    # Callbacks invoked once the game ends
+    game_over: List[Callable[[], None]] = field(default_factory=list)
+
+@njit(cache=True)
+def _take_free_cell(free_cells, free_index, free_count, cell):
+    # Swap the last free cell into this cell's slot and shrink the list
+    slot = free_index[cell]
+    last = free_cells[free_count - 1]
+    free_cells[slot] = last
+    free_index[last] = slot
+    free_cells[free_count - 1] = cell
+    free_index[cell] = free_count - 1
+    return free_count - 1
+
+@njit(cache=True)
+def _release_free_cell(free_cells, free_index, free_count, cell):
+    free_cells[free_count] = cell
+    free_index[cell] = free_count
+    return free_count + 1
+
+def new_snake(width: int, height: int) -> Snake:
+    x, y = width // 2, height // 2
+    cell = y * width + x
+    # One spare slot so a snake filling the grid can still grow into its death
+    body_x = np.zeros(width * height + 1, dtype=np.int32)
+    body_y = np.zeros(width * height + 1, dtype=np.int32)
+    body_x[0] = x
+    body_y[0] = y
+    occupied = np.zeros(width * height, dtype=np.uint8)
+    occupied[cell] = 1
+    free_cells = np.arange(width * height, dtype=np.int32)
+    free_index = np.arange(width * height, dtype=np.int32)
+    free_count = _take_free_cell(free_cells, free_index, width * height, cell)
+    return Snake(body_x, body_y, occupied, free_cells, free_index, free_count)
 
 # Game Systems
+@njit(cache=True)
+def _step_snake(body_x, body_y, head, length, growth_pending, occupied,
+                free_cells, free_index, free_count, width, height, dx, dy, food_x, food_y):
+    # Advance the snake one cell and report
+    # (head, length, growth_pending, free_count, ate, collided)
+    capacity = body_x.shape[0]
+    new_x = (body_x[head] + dx) % width
+    new_y = (body_y[head] + dy) % height
+
+    if growth_pending > 0:
+        growth_pending -= 1
+        length += 1
+    else:
+        # Free the tail first so the head may follow it into the same cell
+        tail = (head + length - 1) % capacity
+        tail_cell = body_y[tail] * width + body_x[tail]
+        occupied[tail_cell] = 0
+        free_count = _release_free_cell(free_cells, free_index, free_count, tail_cell)
+
+    head = (head - 1) % capacity
+    body_x[head] = new_x
+    body_y[head] = new_y
+    cell = new_y * width + new_x
+    collided = occupied[cell] != 0
+    if not collided:
+        occupied[cell] = 1
+        free_count = _take_free_cell(free_cells, free_index, free_count, cell)
+
+    ate = new_x == food_x and new_y == food_y
+    if ate:
+        growth_pending += 1
+    return head, length, growth_pending, free_count, ate, collided
+
+# Per-entity steps shared by the systems and SnakeGame's specialized tick
+def _steer(velocity: Velocity, direction: Direction):
+    # Prevent 180-degree turns
+    if direction != _OPPOSITE[velocity.direction]:
+        velocity.direction = direction
+        velocity.dx, velocity.dy = _DELTA[direction]
+
+def _move_snake(snake: Snake, velocity: Velocity, grid: Grid, food: Food):
+    (snake.head, snake.length, snake.growth_pending, snake.free_count,
+     snake.ate, snake.collided) = _step_snake(
+        snake.body_x, snake.body_y, snake.head, snake.length, snake.growth_pending, snake.occupied,
+        snake.free_cells, snake.free_index, snake.free_count,
+        grid.width, grid.height, velocity.dx, velocity.dy, food.x, food.y,
+    )
+
+def _resolve_collisions(snake: Snake, food: Food, grid: Grid, score: Score, game_state: GameState):
+    # The move already grew the snake if it reached the food
+    if snake.ate:
+        score.value += 1
+        for callback in score.score_changed:
+            callback(score.value)
+        _respawn_food(snake, food, grid)
+
+    if snake.collided:
+        game_state.is_game_over = True
+        for callback in game_state.game_over:
+            callback()
+
+def _respawn_food(snake: Snake, food: Food, grid: Grid):
+    # Sample straight from the free cells; nothing to place once the grid is full
+    if snake.free_count:
+        cell = int(snake.free_cells[random.randrange(snake.free_count)])
+        food.x = cell % grid.width
+        food.y = cell // grid.width
+
 class MovementSystem(System):
+    required = (Snake, Velocity, Grid, Food)
+
     def update(self, world: World, dt: float):
-        for entity_id in world.get_entities_with_component(Snake):
-            snake = world.get_component(entity_id, Snake)
-            velocity = world.get_component(entity_id, Velocity)
-            grid = world.get_component(entity_id, Grid)
-
-            # Move the snake
-            head = snake.body[0]
-            new_head = None
-            if velocity.direction == Direction.UP:
-                new_head = (head[0], (head[1] - 1) % grid.height)
-            elif velocity.direction == Direction.DOWN:
-                new_head = (head[0], (head[1] + 1) % grid.height)
-            elif velocity.direction == Direction.LEFT:
-                new_head = ((head[0] - 1) % grid.width, head[1])
-            elif velocity.direction == Direction.RIGHT:
-                new_head = ((head[0] + 1) % grid.width, head[1])
-
-            snake.body.insert(0, new_head)
-            if snake.growth_pending > 0:
-                snake.growth_pending -= 1
-            else:
-                snake.body.pop()
+        for archetype in self.archetypes:
+            columns = archetype.columns
+            for snake, velocity, grid, food in zip(
+                columns[Snake], columns[Velocity], columns[Grid], columns[Food]
+            ):
+                _move_snake(snake, velocity, grid, food)
 
 class CollisionSystem(System):
-    def update(self, world: World, dt: float):
-        for entity_id in world.get_entities_with_component(Snake):
-            snake = world.get_component(entity_id, Snake)
-            food = world.get_component(entity_id, Food)
-            score = world.get_component(entity_id, Score)
-            game_state = world.get_component(entity_id, GameState)
-
-            # Check for collision with food
-            if snake.body[0] == (food.position.x, food.position.y):
-                snake.growth_pending += 1
-                score.value += 1
-                score.score_changed.on_next(score.value)
-                self._respawn_food(world, entity_id)
-
-            # Check for collision with self
-            if snake.body[0] in snake.body[1:]:
-                game_state.is_game_over = True
-                game_state.game_over_subject.on_next(True)
-
-    def _respawn_food(self, world: World, entity_id: int):
-        snake = world.get_component(entity_id, Snake)
-        food = world.get_component(entity_id, Food)
-        grid = world.get_component(entity_id, Grid)
+    required = (Snake, Food, Grid, Score, GameState)
 
-        while True:
-            new_x = random.randint(0, grid.width - 1)
-            new_y = random.randint(0, grid.height - 1)
-            if (new_x, new_y) not in snake.body:
-                food.position = Position(new_x, new_y)
-                break
+    def update(self, world: World, dt: float):
+        for archetype in self.archetypes:
+            columns = archetype.columns
+            for snake, food, grid, score, game_state in zip(
+                columns[Snake], columns[Food], columns[Grid], columns[Score], columns[GameState]
+            ):
+                _resolve_collisions(snake, food, grid, score, game_state)
 
 class InputSystem(System):
+    required = (Velocity,)
+
     def __init__(self):
         self.pending_direction = None
+        # Input steers a single entity; its velocity is looked up on first use
+        self._velocity = None
 
     def set_direction(self, direction: Direction):
         self.pending_direction = direction
 
     def update(self, world: World, dt: float):
-        if self.pending_direction is not None:
-            for entity_id in world.get_entities_with_component(Velocity):
-                velocity = world.get_component(entity_id, Velocity)
-                # Prevent 180-degree turns
-                if (self.pending_direction == Direction.UP and velocity.direction != Direction.DOWN) or \
-                   (self.pending_direction == Direction.DOWN and velocity.direction != Direction.UP) or \
-                   (self.pending_direction == Direction.LEFT and velocity.direction != Direction.RIGHT) or \
-                   (self.pending_direction == Direction.RIGHT and velocity.direction != Direction.LEFT):
-                    velocity.direction = self.pending_direction
-            self.pending_direction = None
+        direction = self.pending_direction
+        if direction is None:
+            return
+        if self._velocity is None:
+            self._velocity = next(
+                (v for archetype in self.archetypes for v in archetype.columns[Velocity]), None
+            )
+        if self._velocity is not None:
+            _steer(self._velocity, direction)
+        self.pending_direction = None
 
 # Main Game Loop
 class SnakeGame:
     def __init__(self, width: int, height: int):
+        # The world stays the authoritative store for the game entity, so the
+        # generic systems above can drive it too. The game itself only ever
+        # has this one entity, and ticks it through direct references.
         self.world = World()
-        self.input_system = InputSystem()
-
-        # Create systems
-        self.world.add_system(self.input_system)
-        self.world.add_system(MovementSystem())
-        self.world.add_system(CollisionSystem())
+        self.pending_direction = None
 
-        # Create game entity
+        self.grid = Grid(width, height)
+        self.snake = new_snake(width, height)
+        self.velocity = Velocity(Direction.RIGHT, *_DELTA[Direction.RIGHT])
+        self.food = Food(0, 0)
+        self.score = Score()
+        self.state = GameState()
         game_entity = self.world.create_entity()
-        self.world.add_component(game_entity, Grid(width, height))
-        self.world.add_component(game_entity, Snake([(width // 2, height // 2)]))
-        self.world.add_component(game_entity, Velocity(Direction.RIGHT))
-        self.world.add_component(game_entity, Food(Position(0, 0)))
-        self.world.add_component(game_entity, Score())
-        self.world.add_component(game_entity, GameState())
+        self.world.add_component(game_entity, self.grid)
+        self.world.add_component(game_entity, self.snake)
+        self.world.add_component(game_entity, self.velocity)
+        self.world.add_component(game_entity, self.food)
+        self.world.add_component(game_entity, self.score)
+        self.world.add_component(game_entity, self.state)
 
         # Spawn initial food
-        collision_system = next(s for s in self.world.systems if isinstance(s, CollisionSystem))
-        collision_system._respawn_food(self.world, game_entity)
+        _respawn_food(self.snake, self.food, self.grid)
 
     def update(self):
-        self.world.update(0.1)  # Fixed time step
-        game_state = self.world.get_component(0, GameState)
-        return game_state.is_game_over
+        # Same steps as InputSystem, MovementSystem and CollisionSystem, in
+        # that order, without dispatching through the world
+        if self.pending_direction is not None:
+            _steer(self.velocity, self.pending_direction)
+            self.pending_direction = None
+        _move_snake(self.snake, self.velocity, self.grid, self.food)
+        _resolve_collisions(self.snake, self.food, self.grid, self.score, self.state)
+        return self.state.is_game_over
 
     def set_direction(self, direction: Direction):
-        self.input_system.set_direction(direction)
+        self.pending_direction = direction
 
 # Game UI
+# Cursor home + clear screen, written as part of each frame
+_CLEAR = b'\x1b[H\x1b[2J'
+# Framebuffer cell codes and the characters they render as
+_EMPTY, _BODY, _HEAD, _FOOD = 0, 1, 2, 3
+_CELL_CHARS = bytes.maketrans(bytes((_EMPTY, _BODY, _HEAD, _FOOD)), b'.O@F')
+
 class SnakeGameUI:
     def __init__(self, width: int, height: int):
         self.game = SnakeGame(width, height)
         self.width = width
         self.height = height
+        # Framebuffer of cell codes reused across frames, one byte per cell
+        self._frame = bytearray(width * height)
 
     def start(self):
-        # Set up reactive subscribers
-        score = self.game.world.get_component(0, Score)
-        score.score_changed.subscribe(lambda s: print(f"Score: {s}"))
+        # Windows 10+ consoles only honour the ANSI sequences in _CLEAR once
+        # virtual terminal processing is on, which any os.system call enables
+        if os.name == 'nt':
+            os.system('')
 
-        game_state = self.game.world.get_component(0, GameState)
-        game_state.game_over_subject.subscribe(lambda _: print("Game Over!"))
+        # Set up event callbacks
+        self.game.score.score_changed.append(lambda s: print(f"Score: {s}"))
+        self.game.state.game_over.append(lambda: print("Game Over!"))
 
         # Start the game loop
         while True:
@@ -230,23 +417,29 @@ class SnakeGameUI:
                 break
 
     def render(self):
-        os.system('cls' if os.name == 'nt' else 'clear')
-        
-        grid = [['.' for _ in range(self.width)] for _ in range(self.height)]
-        
-        snake = self.game.world.get_component(0, Snake)
-        food = self.game.world.get_component(0, Food)
-        score = self.game.world.get_component(0, Score)
-        
-        for segment in snake.body:
-            grid[segment[1]][segment[0]] = 'O'
-        grid[snake.body[0][1]][snake.body[0][0]] = '@'
-        
-        grid[food.position.y][food.position.x] = 'F'
-        
-        print(f"Score: {score.value}")
-        for row in grid:
-            print(''.join(row))
+        w = self.width
+        frame = self._frame
+
+        snake = self.game.snake
+        food = self.game.food
+        score = self.game.score
+
+        # The occupancy grid already holds 1 (_BODY) on every body cell
+        frame[:] = memoryview(snake.occupied)
+        frame[snake.body_y[snake.head] * w + snake.body_x[snake.head]] = _HEAD
+        frame[food.y * w + food.x] = _FOOD
+
+        rows = frame.translate(_CELL_CHARS)
+        out = b''.join((
+            _CLEAR,
+            f"Score: {score.value}\n".encode(),
+            b'\n'.join(rows[r * w:(r + 1) * w] for r in range(self.height)),
+            b'\n',
+        ))
+        # Flush pending text output first so the frame lands after it
+        sys.stdout.flush()
+        sys.stdout.buffer.write(out)
+        sys.stdout.buffer.flush()
 
 if __name__ == "__main__":
     game_ui = SnakeGameUI(20, 15)